@@ -1,20 +1,33 @@
 import os
 import argparse
-import json
+import asyncio
+import contextlib
+import diskcache
+import functools
 import httpx
-import html2text
+import logging
+import orjson
 import re
+import ssl
+import sys
 from urllib.parse import urljoin, urlparse
-from concurrent.futures import ThreadPoolExecutor
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic
+from selectolax.lexbor import LexborHTMLParser
 from dotenv import load_dotenv
 
-# Load environment variables (used for CLI mode only)
-dotenv_path = os.path.join(os.getcwd(), '.env')
-if os.path.exists(dotenv_path):
-    load_dotenv(dotenv_path)
-else:
-    load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
+logger = logging.getLogger(__name__)
+
+# Load environment variables (used for CLI mode only). Modal injects the
+# environment directly, so containers skip the .env lookup.
+if not os.getenv("MODAL_TASK_ID"):
+    dotenv_path = os.path.join(os.getcwd(), '.env')
+    if os.path.exists(dotenv_path):
+        load_dotenv(dotenv_path)
+    else:
+        load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
+
+# Fallback when no per-user key is passed in; resolved once at import
+ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 
 CONTACT_PATHS = [
     "/contact", "/about", "/team", "/contact-us", "/about-us", 
@@ -23,27 +36,306 @@ CONTACT_PATHS = [
     "/our-story", "/the-team", "/employees", "/directory", "/locations", "/offices"
 ]
 
-def fetch_page(client, url, timeout=15):
+# Paths in a site's sitemap.xml / robots.txt worth probing instead of guessing
+# CONTACT_PATHS; capped so a large sitemap doesn't fan out into dozens of GETs
+CONTACT_PATH_RE = re.compile(r'/(contact|about|team|people|staff|leadership|founders)', re.IGNORECASE)
+MAX_DISCOVERED_PATHS = 5
+SITEMAP_LOC_RE = re.compile(r'<loc>\s*([^<\s]+)\s*</loc>', re.IGNORECASE)
+ROBOTS_PATH_RE = re.compile(r'^\s*allow\s*:\s*(/\S*)', re.IGNORECASE | re.MULTILINE)
+
+# One pooled client is shared by every lead in a pipeline run, so keep-alive
+# connections and TLS sessions are reused instead of re-handshaking per request.
+HTTP_LIMITS = httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+
+def make_http_client(verify=True):
+    """
+    Create the pooled AsyncClient shared by all fetches in one pipeline run.
+    verify=False is only for the per-site fallback in fetch_site.
+    """
+    return httpx.AsyncClient(
+        headers={'User-Agent': 'Mozilla/5.0'},
+        verify=verify,
+        http2=True,
+        limits=HTTP_LIMITS,
+    )
+
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+}
+
+# Pages shorter than this are treated as empty/404 shells that returned 200
+MIN_PAGE_LENGTH = 500
+
+# Cap on links appended to a page's text; nav menus can list hundreds
+MAX_PAGE_LINKS = 100
+
+# Facebook Pixel (fbevents.js / fbq init) and Google tag (gtag.js, Analytics/Ads
+# IDs) markers, combined so the page is scanned once
+PIXEL_RE = re.compile(
+    r"(?P<facebook>fbevents\.js|fbq\('init')"
+    r"|(?P<google>googletagmanager\.com/gtag/js|gtag\(|UA-|G-|AW-)"
+)
+
+# Extraction results are reused across runs for the same site (the LLM call is
+# the dominant cost per lead). Point EXTRACT_CACHE_DIR at a persistent volume to
+# share the cache between containers.
+EXTRACT_CACHE_DIR = os.getenv("EXTRACT_CACHE_DIR", os.path.join(".tmp", "extract_cache"))
+EXTRACT_CACHE_TTL = 30 * 24 * 60 * 60  # 30 days
+
+@functools.lru_cache(maxsize=1)
+def get_extract_cache():
+    """Opened lazily so importing this module doesn't create the cache directory."""
+    return diskcache.Cache(EXTRACT_CACHE_DIR)
+
+def normalize_url(url):
+    """Collapse scheme, case, www. and trailing-slash variants of the same site."""
+    parsed = urlparse(url if "://" in url else f"http://{url}")
+    host = parsed.netloc.lower().removeprefix("www.")
+    normalized = host + parsed.path.rstrip("/")
+    if parsed.query:
+        normalized += f"?{parsed.query}"
+    return normalized
+
+def make_anthropic_client(api_key):
+    """
+    Create the AsyncAnthropic client shared by all leads in one pipeline run.
+    Like the HTTP client it is bound to the run's event loop, so it is created
+    per run rather than cached at module level.
+    """
+    return AsyncAnthropic(api_key=api_key, max_retries=2)
+
+class CertificateVerifyError(Exception):
+    """Raised by fetch_page when a site's TLS certificate fails verification."""
+
+def is_certificate_error(exc):
+    """httpx wraps the ssl error in its own ConnectError, so walk the chain."""
+    while exc is not None:
+        if isinstance(exc, ssl.SSLCertVerificationError):
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+async def fetch_page(client, url, timeout=15, quiet=False):
+    """
+    Returns the page body, or "" on any error. quiet=True logs failures at
+    DEBUG, for fetches where a miss is expected (sitemap.xml, robots.txt).
+    """
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-        }
-        response = client.get(url, timeout=timeout, follow_redirects=True, headers=headers)
+        response = await client.get(url, timeout=timeout, follow_redirects=True, headers=BROWSER_HEADERS)
         response.raise_for_status()
         return response.text
     except Exception as e:
-        print(f"Error fetching {url}: {e}")
+        if is_certificate_error(e):
+            raise CertificateVerifyError(url) from e
+        logger.log(logging.DEBUG if quiet else logging.WARNING, "Error fetching %s: %s", url, e)
+        return ""
+
+async def check_path(client, base_url, path):
+    """
+    Fetches one candidate contact page. A HEAD request screens out missing and
+    near-empty pages before the body is downloaded.
+
+    Returns (path, html) or None if the page is missing or too small.
+    """
+    full_url = urljoin(base_url, path)
+    logger.debug("Checking %s...", full_url)
+    try:
+        head = await client.head(full_url, timeout=10, follow_redirects=True, headers=BROWSER_HEADERS)
+    except Exception as e:
+        # Let fetch_site retry the whole site without verification
+        if is_certificate_error(e):
+            raise CertificateVerifyError(full_url) from e
+        # Unreachable host or timeout: a GET would only fail the same way
+        logger.debug("Error checking %s: %s", full_url, e)
+        return None
+
+    # Servers that don't implement HEAD fall through to a plain GET
+    if head.status_code not in (405, 501):
+        if head.status_code != 200:
+            return None
+        length = head.headers.get('Content-Length', '')
+        if length.isdigit() and int(length) < MIN_PAGE_LENGTH and 'Content-Encoding' not in head.headers:
+            return None
+
+    # Most candidate paths don't exist, so a failed probe isn't worth a warning
+    html = await fetch_page(client, full_url, quiet=True)
+    if len(html) <= MIN_PAGE_LENGTH:
+        return None
+    return path, html
+
+async def gather_all(*aws):
+    """
+    Like asyncio.gather, but waits for every awaitable before re-raising the
+    first error, so failures in the siblings aren't left unretrieved.
+    """
+    results = await asyncio.gather(*aws, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+async def discover_contact_paths(client, url):
+    """
+    Reads sitemap.xml and robots.txt for real contact/about/team pages, so
+    well-structured sites get a few targeted probes instead of the full
+    speculative CONTACT_PATHS list (which SPA shells answer with 200 anyway).
+
+    Returns up to MAX_DISCOVERED_PATHS paths, shortest first, or None when
+    neither file lists a matching page.
+    """
+    sitemap, robots = await gather_all(
+        # Most small sites have neither file, so a 404 here isn't worth a warning
+        fetch_page(client, urljoin(url, '/sitemap.xml'), timeout=10, quiet=True),
+        fetch_page(client, urljoin(url, '/robots.txt'), timeout=10, quiet=True),
+    )
+    host = urlparse(url).netloc.lower().removeprefix('www.')
+    paths = set()
+    for rule in ROBOTS_PATH_RE.findall(robots):
+        # Allow values are URL patterns: a trailing $ anchors the match and * is
+        # a wildcard. Only rules that name one literal path can be probed.
+        rule = rule.removesuffix('$')
+        if '*' not in rule and '$' not in rule:
+            paths.add(rule)
+    for loc in SITEMAP_LOC_RE.findall(sitemap):
+        parsed = urlparse(loc)
+        if parsed.netloc.lower().removeprefix('www.') == host:
+            paths.add(parsed.path)
+
+    matches = sorted((p for p in paths if CONTACT_PATH_RE.search(p)), key=len)
+    return matches[:MAX_DISCOVERED_PATHS] or None
+
+async def probe_contact_paths(client, url):
+    paths = await discover_contact_paths(client, url)
+    if paths:
+        logger.info("Found contact pages in sitemap/robots.txt: %s", ', '.join(paths))
+    return await gather_all(*(check_path(client, url, p) for p in paths or CONTACT_PATHS))
+
+async def fetch_site(client, url):
+    """
+    Fetches the main page and the site's contact pages concurrently. Contact
+    pages come from sitemap.xml/robots.txt when listed there, otherwise every
+    path in CONTACT_PATHS is probed.
+
+    Certificates are verified by default. A site whose certificate fails
+    verification (self-signed, expired, wrong host - common on small business
+    hosting) is refetched with a throwaway unverified client, so the fallback
+    applies to that origin only.
+
+    Returns [main_html, *pages] with one check_path result per probed path, or
+    [""] when the main page can't be fetched.
+    """
+    async def fetch_all(site_client):
+        probe = asyncio.create_task(probe_contact_paths(site_client, url))
+        main_html = ""
+        try:
+            main_html = await fetch_page(site_client, url)
+        finally:
+            # Dead domains are common in Maps data, and their contact pages
+            # would be discarded anyway: stop probing once the main page fails
+            if not main_html:
+                probe.cancel()
+                await asyncio.gather(probe, return_exceptions=True)
+        if not main_html:
+            return [main_html]
+        return [main_html, *await probe]
+
+    try:
+        return await fetch_all(client)
+    except CertificateVerifyError:
+        logger.warning("Certificate verification failed for %s, retrying without verification", url)
+        async with make_http_client(verify=False) as insecure_client:
+            return await fetch_all(insecure_client)
+
+# Main pages shorter than this, with no contact hints and no contact pages, are
+# placeholders (parked domains, error shells) and skip the LLM call
+MIN_SITE_LENGTH = 2000
+
+# Any sign of contact details in raw HTML: an email, tel:/mailto: link, a
+# (555)-style area code or an international +NN prefix
+CONTACT_HINT_RE = re.compile(r'@|tel:|mailto:|\(\d{3}\)|\+\d{1,3}[\s-]')
+
+# Plain 555-123-4567 style numbers carry no CONTACT_HINT_RE marker, so they are
+# still recovered from short-circuited sites without the LLM
+PHONE_RE = re.compile(r'(?:\+\d{1,3}[\s.-]?)?\(?\b\d{3}\)?[\s.-]?\d{3}[\s.-]\d{4}\b')
+
+# Outermost {...} span of the model's reply, which may wrap the JSON in prose
+JSON_OBJECT_RE = re.compile(rb'\{.*\}', re.DOTALL)
+
+# Static part of the extraction prompt, identical for every lead. It is marked
+# cache_control, but at ~300 tokens it is well below claude-3-5-haiku's
+# 2048-token minimum cacheable prefix, so the marker currently does nothing;
+# it only takes effect if these instructions grow past that minimum.
+EXTRACTION_INSTRUCTIONS = """
+You are an expert data extractor. Extract contact information for the BUSINESS named below from the website and search content that follows.
+
+Return a VALID JSON object with this exact structure:
+{
+  "executive_summary": "A concise 3-sentence summary of what the business does, their specialty, and who they serve.",
+  "emails": ["list of strings"],
+  "phone_numbers": ["list of strings"],
+  "addresses": ["list of strings"],
+  "social_media": {
+    "facebook": "url or null",
+    "twitter": "url or null",
+    "linkedin": "url or null",
+    "instagram": "url or null",
+    "youtube": "url or null",
+    "tiktok": "url or null"
+  },
+  "owner_info": {
+    "name": "string or null",
+    "title": "string or null",
+    "email": "string or null",
+    "phone": "string or null",
+    "linkedin": "string or null"
+  },
+  "team_members": [{"name": "string", "title": "string", "email": "string", "phone": "string", "linkedin": "string"}],
+  "business_hours": "string or null",
+  "additional_contacts": ["list of strings"]
+}
+
+If a field is not found, use null or empty list. Do not invent information.
+Only return the JSON object, no other text.
+"""
+
+def detect_pixels(html):
+    """Returns (has_facebook_pixel, has_google_pixel) from a single pass over the HTML."""
+    has_fb_pixel = has_google_pixel = False
+    for match in PIXEL_RE.finditer(html):
+        if match.lastgroup == 'facebook':
+            has_fb_pixel = True
+        else:
+            has_google_pixel = True
+        if has_fb_pixel and has_google_pixel:
+            break
+    return has_fb_pixel, has_google_pixel
+
+def html_to_text(html_content):
+    """
+    Converts HTML to plain text for the LLM, followed by the page's unique link
+    targets (social profiles and mailto:/tel: contacts mostly live in hrefs).
+    """
+    tree = LexborHTMLParser(html_content)
+    for node in tree.css('script, style, noscript, svg, template'):
+        node.decompose()
+
+    root = tree.body
+    if root is None:
         return ""
 
-def html_to_markdown(html_content):
-    h = html2text.HTML2Text()
-    h.ignore_links = False
-    h.ignore_images = True
-    return h.handle(html_content)
+    text = "\n".join(line for line in root.text(separator='\n', strip=True).splitlines() if line)
 
-def search_duckduckgo(query):
+    links = dict.fromkeys(
+        href for href in (a.attributes.get('href') for a in root.css('a[href]'))
+        if href and not href.startswith(('#', 'javascript:'))
+    )
+    if links:
+        text += "\n\nLinks:\n" + "\n".join(list(links)[:MAX_PAGE_LINKS])
+    return text
+
+async def search_duckduckgo(client, query):
     # Fallback to DuckDuckGo HTML version if pure API is not used
     # Note: Implementing a robust free DDG search is complex. 
     # For now, we'll try a simple request to html.duckduckgo.com
@@ -51,15 +343,14 @@ def search_duckduckgo(query):
         url = "https://html.duckduckgo.com/html/"
         data = {'q': query}
         headers = {'User-Agent': 'Mozilla/5.0'}
-        with httpx.Client() as client:
-            resp = client.post(url, data=data, headers=headers)
-            if resp.status_code == 200:
-                return html_to_markdown(resp.text)
+        resp = await client.post(url, data=data, headers=headers)
+        if resp.status_code == 200:
+            return html_to_text(resp.text)
     except Exception:
         pass
     return ""
 
-def extract_contacts(url, business_name, anthropic_key=None):
+async def extract_contacts(url, business_name, anthropic_key=None, client=None, anthropic=None):
     """
     Orchestrates the contact extraction process.
 
@@ -67,60 +358,79 @@ def extract_contacts(url, business_name, anthropic_key=None):
         url: The website URL to extract contacts from
         business_name: The name of the business
         anthropic_key: Optional Anthropic API key. If not provided, uses ANTHROPIC_API_KEY env var.
+        client: Optional shared httpx.AsyncClient (see make_http_client). A
+            temporary one is created when omitted.
+        anthropic: Optional shared AsyncAnthropic client (see make_anthropic_client).
+            A temporary one is created when omitted.
     """
     # Use provided key or fall back to environment variable
-    api_key = anthropic_key or os.getenv("ANTHROPIC_API_KEY")
+    api_key = anthropic_key or ANTHROPIC_API_KEY
 
     if not api_key:
         raise ValueError("Anthropic key not provided and ANTHROPIC_API_KEY not found in environment variables.")
 
-    client = httpx.Client(headers={'User-Agent': 'Mozilla/5.0'}, verify=False)
+    if client is None or anthropic is None:
+        async with contextlib.AsyncExitStack() as stack:
+            if client is None:
+                client = await stack.enter_async_context(make_http_client())
+            if anthropic is None:
+                anthropic = await stack.enter_async_context(make_anthropic_client(api_key))
+            return await extract_contacts(url, business_name, api_key, client, anthropic)
+
+    cache = get_extract_cache()
+    cache_key = (normalize_url(url), business_name)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        logger.info("Using cached extraction for %s", url)
+        return cached
+
     markdown_content = ""
-    
-    print(f"Fetching main page: {url}")
-    main_html = fetch_page(client, url)
+
+    # The main page, contact paths and DuckDuckGo search depend only on the URL
+    # and business name, so their round trips overlap instead of running in turn
+    logger.info("Fetching main page: %s", url)
+    logger.info("Searching DuckDuckGo for owner info...")
+    (main_html, *pages), ddg_content = await asyncio.gather(
+        fetch_site(client, url),
+        search_duckduckgo(client, f"{business_name} owner email contact"),
+    )
     if not main_html:
-        print(f"Failed to fetch {url}")
+        logger.warning("Failed to fetch %s", url)
         return {}
 
-    markdown_content += f"# Main Page ({url})\n\n{html_to_markdown(main_html)}\n\n"
+    main_text = html_to_text(main_html)
+    markdown_content += f"# Main Page ({url})\n\n{main_text}\n\n"
 
-    # Detect Facebook Pixel
-    has_fb_pixel = False
-    if main_html:
-        # Look for standard FB Pixel init code or fbevents.js
-        if "fbevents.js" in main_html or "fbq('init'" in main_html:
-            has_fb_pixel = True
-            print("  [+] Facebook Pixel detected!")
+    # Detect Facebook Pixel and Google Pixel (Ads/Analytics)
+    has_fb_pixel, has_google_pixel = detect_pixels(main_html)
+    if has_fb_pixel:
+        logger.info("  [+] Facebook Pixel detected!")
+    if has_google_pixel:
+        logger.info("  [+] Google Pixel/Ads detected!")
 
-    # Detect Google Pixel (Ads/Analytics)
-    has_google_pixel = False
-    if main_html:
-        # Look for gtag.js, Google Tag Manager, or Analytics/Ads IDs
-        if "googletagmanager.com/gtag/js" in main_html or "gtag(" in main_html or "UA-" in main_html or "G-" in main_html or "AW-" in main_html:
-            has_google_pixel = True
-            print("  [+] Google Pixel/Ads detected!")
+    # SPA catch-all routes serve the same shell for every path (often the main page)
+    seen_pages = {hash(main_html)}
+    for page in pages:
+        if page is None:
+            continue
+        path, html = page
+        page_key = hash(html)
+        if page_key in seen_pages:
+            continue
+        seen_pages.add(page_key)
+        markdown_content += f"# Page {path}\n\n{html_to_text(html)}\n\n"
 
-    # Find potential contact pages linked from main page or guess them
-    # Simple strategy: try the known paths
-    found_pages = []
-    
-    def check_path(path):
-        full_url = urljoin(url, path)
-        print(f"Checking {full_url}...")
-        html = fetch_page(client, full_url)
-        if html and len(html) > 500: # fast check for 404/empty pages that return 200
-             return f"# Page {path}\n\n{html_to_markdown(html)}\n\n"
-        return ""
-
-    with ThreadPoolExecutor(max_workers=3) as executor:
-        results = executor.map(check_path, CONTACT_PATHS[:5]) # limit to first 5 likely ones for speed
-        for res in results:
-             markdown_content += res
+    # Nothing on the site worth an LLM call; return what the regexes can find
+    if len(main_html) < MIN_SITE_LENGTH and len(seen_pages) == 1 and not CONTACT_HINT_RE.search(main_html):
+        logger.info("  [-] No usable site content, skipping Claude extraction")
+        return {
+            # No '@' anywhere in the HTML, so there is no email to find
+            'emails': [],
+            'phone_numbers': list(dict.fromkeys(PHONE_RE.findall(main_text))),
+            'facebook_pixel': has_fb_pixel,
+            'google_pixel': has_google_pixel,
+        }
 
-    # Search DuckDuckGo for owner
-    print(f"Searching DuckDuckGo for owner info...")
-    ddg_content = search_duckduckgo(f"{business_name} owner email contact")
     markdown_content += f"# DuckDuckGo Search Results\n\n{ddg_content}\n\n"
 
     # Truncate to avoids token limits
@@ -128,52 +438,26 @@ def extract_contacts(url, business_name, anthropic_key=None):
         markdown_content = markdown_content[:50000] + "\n...[TRUNCATED]"
 
     # Send to Claude
-    print("Sending content to Claude for extraction...")
-    anthropic = Anthropic(api_key=api_key)
-    
-    prompt = f"""
-    You are an expert data extractor. Extract contact information for the business "{business_name}" from the following website and search content.
+    logger.info("Sending content to Claude for extraction...")
     
-    Return a VALID JSON object with this exact structure:
-    {{
-      "executive_summary": "A concise 3-sentence summary of what the business does, their specialty, and who they serve.",
-      "emails": ["list of strings"],
-      "phone_numbers": ["list of strings"],
-      "addresses": ["list of strings"],
-      "social_media": {{
-        "facebook": "url or null",
-        "twitter": "url or null",
-        "linkedin": "url or null",
-        "instagram": "url or null",
-        "youtube": "url or null",
-        "tiktok": "url or null"
-      }},
-      "owner_info": {{
-        "name": "string or null",
-        "title": "string or null",
-        "email": "string or null",
-        "phone": "string or null",
-        "linkedin": "string or null"
-      }},
-      "team_members": [{{"name": "string", "title": "string", "email": "string", "phone": "string", "linkedin": "string"}}],
-      "business_hours": "string or null",
-      "additional_contacts": ["list of strings"]
-    }}
-
-    If a field is not found, use null or empty list. Do not invent information.
-    Only return the JSON object, no other text.
+    # Per-lead part of the prompt; follows the cached instructions
+    lead_prompt = f"""
+    BUSINESS: "{business_name}"
 
     CONTENT:
     {markdown_content}
     """
 
-    message = anthropic.messages.create(
-        model="claude-3-haiku-20240307",
-        max_tokens=1500,
+    message = await anthropic.messages.create(
+        model="claude-3-5-haiku-20241022",
+        max_tokens=1024,  # typical replies are 400-600 tokens; caps runaway generations
         temperature=0,
         system="Extract structured JSON from the provided text.",
         messages=[
-            {"role": "user", "content": prompt}
+            {"role": "user", "content": [
+                {"type": "text", "text": EXTRACTION_INSTRUCTIONS, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": lead_prompt},
+            ]}
         ]
     )
     
@@ -181,27 +465,26 @@ def extract_contacts(url, business_name, anthropic_key=None):
     
     # Simple cleanup to ensure JSON parsing
     try:
-        content_text = message.content[0].text.strip()
-        # Extract JSON using regex or finding braces
-        start_index = content_text.find('{')
-        end_index = content_text.rfind('}')
+        match = JSON_OBJECT_RE.search(content_text.encode())
         
-        if start_index != -1 and end_index != -1:
-            json_str = content_text[start_index:end_index+1]
-            data = json.loads(json_str)
+        if match:
+            data = orjson.loads(match.group(0))
             # Inject heuristic data
             data['facebook_pixel'] = has_fb_pixel
             data['google_pixel'] = has_google_pixel
+            # Only successful extractions are cached; failures are retried next run
+            cache.set(cache_key, data, expire=EXTRACT_CACHE_TTL)
             return data
         else:
-            print("No JSON object found in response.")
+            logger.warning("No JSON object found in response.")
             return {'facebook_pixel': has_fb_pixel, 'google_pixel': has_google_pixel}
-    except json.JSONDecodeError as e:
-        print("Failed to parse JSON from Claude response.")
-        print(content_text)
+    except orjson.JSONDecodeError:
+        logger.warning("Failed to parse JSON from Claude response: %s", content_text)
         return {'facebook_pixel': has_fb_pixel, 'google_pixel': has_google_pixel}
 
 if __name__ == "__main__":
+    # Logs go to stderr, so stdout carries only the JSON result
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     parser = argparse.ArgumentParser(description="Extract contacts from website.")
     parser.add_argument("--url", required=True, help="Website URL")
     parser.add_argument("--name", required=True, help="Business Name")
@@ -209,7 +492,7 @@ if __name__ == "__main__":
     args = parser.parse_args()
 
     try:
-        data = extract_contacts(args.url, args.name)
-        print(json.dumps(data, indent=2))
+        data = asyncio.run(extract_contacts(args.url, args.name))
+        sys.stdout.buffer.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE))
     except Exception as e:
-        print(f"Error: {e}")
+        logger.error("Error: %s", e)
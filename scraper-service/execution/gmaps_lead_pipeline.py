@@ -1,28 +1,41 @@
 import os
 import argparse
+import asyncio
+import contextlib
 import sys
 import hashlib
-import json
 import gspread
 import csv
+import logging
 import queue
+import re
+import threading
+import time
 import httpx
+import orjson
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
 # Ensure execution dir is in path
 sys.path.append(os.getcwd())
 try:
     from execution.scrape_google_maps import scrape_google_maps
-    from execution.extract_website_contacts import extract_contacts
+    from execution.extract_website_contacts import ANTHROPIC_API_KEY, extract_contacts, make_anthropic_client, make_http_client
 except ImportError:
     # Try relative imports if running as module
     sys.path.append(os.path.join(os.getcwd(), 'execution'))
     from scrape_google_maps import scrape_google_maps
-    from extract_website_contacts import extract_contacts
+    from extract_website_contacts import ANTHROPIC_API_KEY, extract_contacts, make_anthropic_client, make_http_client
 
-load_dotenv()
+# Modal injects the environment directly, so containers skip the .env lookup
+if not os.getenv("MODAL_TASK_ID"):
+    load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Leads enriched concurrently; each is ~20 HTTP fetches plus one LLM call, so
+# almost all of its wall time is spent waiting on the network.
+ENRICH_CONCURRENCY = 32
 
 
 # Common generic email prefixes that don't contain name info
@@ -32,6 +45,40 @@ GENERIC_EMAIL_PREFIXES = {
     'enquiries', 'enquiry', 'mail', 'email', 'web', 'noreply', 'no-reply'
 }
 
+# Column order for Sheet/CSV output - Outreach Focused
+OUTREACH_HEADERS = [
+    "business_name", "category", "rating", "review_count",
+    "owner_name", "owner_title", "emails", "phone",
+    "website", "linkedin", "facebook", "instagram", "facebook_pixel", "google_pixel",
+    "executive_summary", "city", "state", "lead_id"
+]
+
+# 1-based lead_id column per sheet URL, so the header row is only read once
+LEAD_ID_COLUMNS = {}
+
+# US state abbreviations -> full names, as Google Maps may report either form
+US_STATE_NAMES = {
+    "AL": "Alabama", "AK": "Alaska", "AZ": "Arizona", "AR": "Arkansas",
+    "CA": "California", "CO": "Colorado", "CT": "Connecticut", "DE": "Delaware",
+    "DC": "District of Columbia", "FL": "Florida", "GA": "Georgia", "HI": "Hawaii",
+    "ID": "Idaho", "IL": "Illinois", "IN": "Indiana", "IA": "Iowa", "KS": "Kansas",
+    "KY": "Kentucky", "LA": "Louisiana", "ME": "Maine", "MD": "Maryland",
+    "MA": "Massachusetts", "MI": "Michigan", "MN": "Minnesota", "MS": "Mississippi",
+    "MO": "Missouri", "MT": "Montana", "NE": "Nebraska", "NV": "Nevada",
+    "NH": "New Hampshire", "NJ": "New Jersey", "NM": "New Mexico", "NY": "New York",
+    "NC": "North Carolina", "ND": "North Dakota", "OH": "Ohio", "OK": "Oklahoma",
+    "OR": "Oregon", "PA": "Pennsylvania", "RI": "Rhode Island", "SC": "South Carolina",
+    "SD": "South Dakota", "TN": "Tennessee", "TX": "Texas", "UT": "Utah",
+    "VT": "Vermont", "VA": "Virginia", "WA": "Washington", "WV": "West Virginia",
+    "WI": "Wisconsin", "WY": "Wyoming", "PR": "Puerto Rico"
+}
+
+# Upper-cased state values accepted for a two-letter target state
+STATE_ALIASES = {abbr: {abbr, name.upper()} for abbr, name in US_STATE_NAMES.items()}
+
+# Common delimiters between name parts in an email local part: dot, underscore, hyphen
+EMAIL_NAME_DELIMITERS = re.compile(r'[._-]')
+
 def infer_name_from_email(email):
     """
     Tries to extract a probable name from an email address.
@@ -52,8 +99,7 @@ def infer_name_from_email(email):
         if local_part in GENERIC_EMAIL_PREFIXES:
             return None
 
-        # Split by common delimiters: dot, underscore, hyphen
-        parts = re.split(r'[._-]', local_part)
+        parts = EMAIL_NAME_DELIMITERS.split(local_part)
 
         # Filter to only alphabetic parts (remove numbers, etc.)
         valid_parts = [p for p in parts if p.isalpha() and len(p) > 1]
@@ -69,7 +115,16 @@ def infer_name_from_email(email):
 
 
 class ProgressReporter:
-    """Updates Supabase with job progress at each stage."""
+    """
+    Updates Supabase with job progress at each stage.
+
+    Updates are queued and sent by a background thread over one reused
+    connection. Updates arriving within FLUSH_INTERVAL of each other are
+    coalesced into a single PATCH of the latest state, so reporting never
+    blocks the pipeline. Call close() to flush the final state.
+    """
+
+    FLUSH_INTERVAL = 0.5  # seconds
 
     def __init__(self, job_id: str, supabase_url: str, supabase_key: str):
         self.job_id = job_id
@@ -77,51 +132,122 @@ class ProgressReporter:
         self.supabase_key = supabase_key
         self.enabled = bool(supabase_url and supabase_key and job_id)
 
-    def update(self, stage: str, progress: int = 0, message: str = None, leads_found: int = None):
-        """Update job progress in Supabase."""
-        if not self.enabled:
-            print(f"[Progress] {stage}: {progress}% - {message}")
-            return
-
-        try:
-            payload = {
-                "stage": stage,
-                "progress": progress,
-            }
-            if message:
-                payload["stage_message"] = message
-            if leads_found is not None:
-                payload["leads_found"] = leads_found
-
-            url = f"{self.supabase_url}/rest/v1/scrape_jobs?id=eq.{self.job_id}"
-            headers = {
+        if self.enabled:
+            self._url = f"{self.supabase_url}/rest/v1/scrape_jobs?id=eq.{self.job_id}"
+            self._headers = {
                 "apikey": self.supabase_key,
                 "Authorization": f"Bearer {self.supabase_key}",
                 "Content-Type": "application/json",
                 "Prefer": "return=minimal"
             }
+            self._client = httpx.Client(timeout=10, headers=self._headers)
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._drain, name="progress-reporter", daemon=True)
+            self._thread.start()
 
-            with httpx.Client() as client:
-                response = client.patch(url, json=payload, headers=headers, timeout=10)
-                if response.status_code in (200, 204):
-                    print(f"[Progress Updated] {stage}: {progress}% - {message}")
-                else:
-                    print(f"[Progress Update Failed] {response.status_code}: {response.text}")
+    def update(self, stage: str, progress: int = 0, message: str = None, leads_found: int = None):
+        """Queue a job progress update for Supabase."""
+        if not self.enabled:
+            logger.info("[Progress] %s: %s%% - %s", stage, progress, message)
+            return
+
+        payload = {
+            "stage": stage,
+            "progress": progress,
+        }
+        if message:
+            payload["stage_message"] = message
+        if leads_found is not None:
+            payload["leads_found"] = leads_found
+        self._queue.put(payload)
+
+    def close(self):
+        """Send any pending update and release the connection."""
+        if not self.enabled:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=15)
+        self._client.close()
+
+    def _drain(self):
+        stopping = False
+        while not stopping:
+            payload = self._queue.get()
+            if payload is None:
+                break
+
+            # Let rapid-fire updates pile up, then merge them; fields omitted by a
+            # later update keep their earlier value, matching PATCH semantics
+            time.sleep(self.FLUSH_INTERVAL)
+            while True:
+                try:
+                    newer = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if newer is None:
+                    stopping = True
+                    break
+                payload.update(newer)
+
+            self._send(payload)
+
+    def _send(self, payload):
+        try:
+            # Headers (incl. Content-Type) are set once on the client
+            response = self._client.patch(self._url, content=orjson.dumps(payload))
+            if response.status_code in (200, 204):
+                logger.debug("[Progress Updated] %s: %s%% - %s", payload['stage'], payload['progress'], payload.get('stage_message'))
+            else:
+                logger.warning("[Progress Update Failed] %s: %s", response.status_code, response.text)
 
         except Exception as e:
-            print(f"[Progress Update Error] {e}")
+            logger.warning("[Progress Update Error] %s", e)
+
 
+def fetch_existing_company_names(supabase_url, supabase_key, user_id, names):
+    """
+    Returns the subset of `names` the user already has as leads in Supabase.
+
+    Mirrors the scrape-callback dedupe (same user_id + company_name match), but
+    runs before enrichment so existing businesses are never sent to the LLM.
+    Only the company_name column is selected, filtered server-side.
+    """
+    url = f"{supabase_url}/rest/v1/leads"
+    headers = {
+        "apikey": supabase_key,
+        "Authorization": f"Bearer {supabase_key}",
+    }
+    existing = set()
+    names = list(dict.fromkeys(n for n in names if n))
+    with httpx.Client(timeout=10) as client:
+        # Chunked to keep the in.() filter well under URL length limits
+        for i in range(0, len(names), 100):
+            chunk = names[i:i + 100]
+            quoted = ",".join('"' + n.replace('\\', '\\\\').replace('"', '\\"') + '"' for n in chunk)
+            response = client.get(url, headers=headers, params={
+                "select": "company_name",
+                "user_id": f"eq.{user_id}",
+                "company_name": f"in.({quoted})",
+            })
+            response.raise_for_status()
+            existing.update(row["company_name"] for row in response.json())
+    return existing
 
 def get_lead_id(name, address):
-    """Generate MD5 hash of name|address for deduplication."""
+    """
+    Generate MD5 hash of name|address for deduplication.
+
+    Kept as MD5 because lead_ids already stored in Sheets are compared against
+    it; the digest is an identifier only, not a security boundary.
+    """
     raw = f"{name}|{address}"
-    return hashlib.md5(raw.encode()).hexdigest()
+    return hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
 
 def setup_sheet(sheet_url):
     """Authenticate and return Google Sheet worksheet object."""
     try:
         if not os.path.exists('credentials.json'):
-            print("Warning: credentials.json not found. Google Sheets disabled.")
+            logger.warning("credentials.json not found. Google Sheets disabled.")
             return None
         
         gc = gspread.service_account(filename='credentials.json')
@@ -136,22 +262,26 @@ def setup_sheet(sheet_url):
             worksheet = sh.get_worksheet(0)
             
             # Init headers - Outreach Focused
-            headers = [
-                "business_name", "category", "rating", "review_count",
-                "owner_name", "owner_title", "emails", "phone",
-                "website", "linkedin", "facebook", "instagram", "facebook_pixel", "google_pixel",
-                "executive_summary", "city", "state", "lead_id"
-            ]
-            worksheet.append_row(headers)
+            worksheet.append_row(OUTREACH_HEADERS)
             
         return worksheet
     except Exception as e:
-        print(f"Error setting up Google Sheet: {e}")
+        logger.error("Error setting up Google Sheet: %s", e)
         return None
 
-def process_lead(lead, query, anthropic_key=None):
-    """Enrich a single lead (thread-safe worker)."""
-    lead_id = get_lead_id(lead.get('name'), lead.get('address'))
+def load_existing_lead_ids(worksheet, sheet_url):
+    """Fetch only the lead_id column of the Sheet, rather than every record."""
+    col = LEAD_ID_COLUMNS.get(sheet_url)
+    if col is None:
+        col = worksheet.row_values(1).index('lead_id') + 1
+        LEAD_ID_COLUMNS[sheet_url] = col
+    # Skip the header cell
+    return set(worksheet.col_values(col)[1:])
+
+async def process_lead(lead, query, anthropic_key=None, client=None, anthropic=None):
+    """Enrich a single lead, sharing the pipeline's HTTP and Claude clients."""
+    # Usually already computed by the pre-enrichment dedupe
+    lead_id = lead.get('lead_id') or get_lead_id(lead.get('name'), lead.get('address'))
     
     enriched = {
         "lead_id": lead_id,
@@ -169,9 +299,9 @@ def process_lead(lead, query, anthropic_key=None):
     
     if lead.get('website'):
         try:
-             print(f"Enriching {lead.get('name')}...")
+             logger.info("Enriching %s...", lead.get('name'))
              # Call our extraction tool
-             data = extract_contacts(lead['website'], lead['name'], anthropic_key=anthropic_key)
+             data = await extract_contacts(lead['website'], lead['name'], anthropic_key=anthropic_key, client=client, anthropic=anthropic)
              
              # Flatten data
              enriched['emails'] = ", ".join(data.get('emails') or [])
@@ -204,7 +334,7 @@ def process_lead(lead, query, anthropic_key=None):
                      enriched['owner_name'] = infer_name_from_email(first_email)
 
         except Exception as e:
-             print(f"Enrichment error for {lead.get('name')}: {e}")
+             logger.warning("Enrichment error for %s: %s", lead.get('name'), e)
     
     return enriched
 
@@ -216,245 +346,264 @@ def save_to_csv(leads, filename=None):
         timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M')
         filename = f"gmaps_outreach_{timestamp}.csv"
     
-    # Outreach Headers
-    headers = [
-        "business_name", "category", "rating", "review_count",
-        "owner_name", "owner_title", "emails", "phone",
-        "website", "linkedin", "facebook", "instagram", "facebook_pixel", "google_pixel",
-        "executive_summary", "city", "state", "lead_id"
-    ]
-    
     file_exists = os.path.isfile(filename)
     
     try:
-        with open(filename, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=headers, extrasaction='ignore') # Ignore extra internal fields
+        # Project to header order up front (drops extra internal fields)
+        rows = [[lead.get(h, "") for h in OUTREACH_HEADERS] for lead in leads]
+        with open(filename, 'a', newline='', encoding='utf-8', buffering=1 << 20) as f:
+            writer = csv.writer(f)
             if not file_exists:
-                writer.writeheader()
+                writer.writerow(OUTREACH_HEADERS)
             
-            for lead in leads:
-                writer.writerow(lead)
+            writer.writerows(rows)
         
-        print(f"Successfully saved {len(leads)} leads to {filename}")
+        logger.info("Successfully saved %s leads to %s", len(leads), filename)
         return filename
     except Exception as e:
-        print(f"Error saving to CSV: {e}")
+        logger.error("Error saving to CSV: %s", e)
         return None
 
-def save_to_json(leads, filename=None):
+def save_to_jsonl(leads, filename=None):
+    """Append leads as JSON Lines, one object per line (no read-modify-write per batch)."""
     if not leads:
         return
         
     if not filename:
         timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M')
-        filename = f"gmaps_outreach_{timestamp}.json"
+        filename = f"gmaps_outreach_{timestamp}.jsonl"
         
     try:
-        # Load existing (for batching) or start new
-        data = []
-        if os.path.exists(filename):
-            try:
-                with open(filename, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-            except json.JSONDecodeError:
-                data = [] # Corrupt
-        
-        data.extend(leads)
-        
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
+        with open(filename, 'ab') as f:
+            f.writelines(orjson.dumps(lead) + b"\n" for lead in leads)
             
-        print(f"Successfully saved {len(leads)} leads to {filename} (Total: {len(data)})")
+        logger.info("Successfully saved %s leads to %s", len(leads), filename)
         return filename
     except Exception as e:
-        print(f"Error saving to JSON: {e}")
+        logger.error("Error saving to JSONL: %s", e)
         return None
 
-def run_gmaps_pipeline(niche, location, limit=10, increase_radius=False, sheet_url=None, force_csv=False, force_json=False, apify_token=None, anthropic_key=None, job_id=None, supabase_url=None, supabase_key=None):
+def lead_dedupe_key(lead):
+    """Identity of a scraped place when merging the results of several queries."""
+    return lead.get('place_id') or (lead['name'], lead['address'])
+
+def run_gmaps_pipeline(niche, location, limit=10, increase_radius=False, sheet_url=None, force_csv=False, force_json=False, apify_token=None, anthropic_key=None, job_id=None, supabase_url=None, supabase_key=None, user_id=None, stats=None):
     """
     Programmatic entry point for the pipeline.
+
+    If `stats` is a dict, it is filled with counts the caller may report but
+    that aren't visible in the returned leads: `leads_skipped_existing` is the
+    number of businesses dropped because the user already has them in Outreach.
     """
+    if stats is None:
+        stats = {}
+    stats["leads_skipped_existing"] = 0
     # Initialize progress reporter
     progress = ProgressReporter(job_id, supabase_url, supabase_key)
 
-    # 1. Scrape GMaps (Step 1)
-    query_1 = f"{niche} in {location}"
-    progress.update("scraping", 0, f"Searching Google Maps for '{niche}' in {location}...")
-    print(f"Layer 1: Scraping Google Maps for '{query_1}'...")
-    # Pass 'location' as bias to prevent US-centric "too far" errors
-    raw_leads = scrape_google_maps(query_1, limit, apify_token=apify_token, location_bias=location)
-    
-    # Report initial scrape results
-    progress.update("scraping", 50, f"Found {len(raw_leads)} businesses...", leads_found=len(raw_leads))
-
-    # Radius Expansion Logic
-    if increase_radius and len(raw_leads) < limit:
-        print(f"Found only {len(raw_leads)} leads. Expanding radius...")
-        progress.update("scraping", 60, f"Expanding search radius...")
-        query_2 = f"{niche} near {location}"
-        print(f"Layer 1 (Expansion): Scraping for '{query_2}'...")
-
-        # Ask for up to limit again to ensure we get enough candidates
-        raw_leads_2 = scrape_google_maps(query_2, limit, apify_token=apify_token, location_bias=location)
-
-        # Merge and Dedupe Raw Leads
-        seen_ids = set()
-        for l in raw_leads:
-            seen_ids.add(get_lead_id(l['name'], l['address']))
-
-        new_added = 0
-        for l in raw_leads_2:
-            lid = get_lead_id(l['name'], l['address'])
-            if lid not in seen_ids:
-                raw_leads.append(l)
-                seen_ids.add(lid)
-                new_added += 1
-
-        print(f"Expansion added {new_added} unique leads.")
-        progress.update("scraping", 90, f"Found {len(raw_leads)} total businesses", leads_found=len(raw_leads))
-
-    print(f"Total raw leads to enrich: {len(raw_leads)}")
-    progress.update("scraping", 100, f"Scraping complete. Found {len(raw_leads)} businesses.", leads_found=len(raw_leads))
-    # Slice to limit just in case
-    raw_leads = raw_leads[:limit]
+    try:
+        # 1. Scrape GMaps (Step 1)
+        query_1 = f"{niche} in {location}"
+        progress.update("scraping", 0, f"Searching Google Maps for '{niche}' in {location}...")
+        logger.info("Layer 1: Scraping Google Maps for '%s'...", query_1)
+        # Pass 'location' as bias to prevent US-centric "too far" errors
+        raw_leads = list(scrape_google_maps(query_1, limit, apify_token=apify_token, location_bias=location))
+
+        # Report initial scrape results
+        progress.update("scraping", 50, f"Found {len(raw_leads)} businesses...", leads_found=len(raw_leads))
+
+        # Radius Expansion Logic. Only run when query 1 comes up short: the scrape
+        # bills the user's Apify account per result, so a speculative second run
+        # would roughly double the cost of most jobs.
+        if increase_radius and len(raw_leads) < limit:
+            logger.info("Found only %s leads. Expanding radius...", len(raw_leads))
+            progress.update("scraping", 60, "Expanding search radius...")
+            query_2 = f"{niche} near {location}"
+            logger.info("Layer 1 (Expansion): Scraping for '%s'...", query_2)
+
+            # Merge and Dedupe Raw Leads by Google's place_id, falling back to
+            # (name, address) for items without one
+            seen_keys = {lead_dedupe_key(l) for l in raw_leads}
+
+            # Ask for up to limit again to ensure we get enough candidates; items
+            # are deduped as they stream in and reading stops once limit is reached
+            new_added = 0
+            for l in scrape_google_maps(query_2, limit, apify_token=apify_token, location_bias=location):
+                key = lead_dedupe_key(l)
+                if key not in seen_keys:
+                    raw_leads.append(l)
+                    seen_keys.add(key)
+                    new_added += 1
+                    if len(raw_leads) >= limit:
+                        break
+
+            logger.info("Expansion added %s unique leads.", new_added)
+            progress.update("scraping", 90, f"Found {len(raw_leads)} total businesses", leads_found=len(raw_leads))
+
+        logger.info("Total raw leads to enrich: %s", len(raw_leads))
+        progress.update("scraping", 100, f"Scraping complete. Found {len(raw_leads)} businesses.", leads_found=len(raw_leads))
+        # Slice to limit just in case
+        raw_leads = raw_leads[:limit]
     
-    # Load existing IDs upfront for pre-enrichment deduplication
-    existing_ids = set()
-    worksheet = None
-    use_sheet = False
+        # Load existing IDs upfront for pre-enrichment deduplication
+        existing_ids = set()
+        worksheet = None
+        use_sheet = False
     
-    # Determine output mode
-    use_sheet = (sheet_url is not None) and (not force_csv) and (not force_json)
-
-    if use_sheet:
-        worksheet = setup_sheet(sheet_url)
-        if worksheet:
-             try:
-                 existing_records = worksheet.get_all_records()
-                 existing_ids = set(str(row.get('lead_id')) for row in existing_records)
-                 print(f"Loaded {len(existing_ids)} existing leads from Sheet for deduplication.")
-             except Exception as e:
-                 print(f"Warning: Could not load existing records: {e}")
-        else:
-            use_sheet = False
-
-    # Dedupe raw leads against existing Sheet IDs *before* processing
-    # AND Filter by State/Location if possible
-    unique_raw_leads = []
+        # Determine output mode
+        use_sheet = (sheet_url is not None) and (not force_csv) and (not force_json)
+
+        if use_sheet:
+            worksheet = setup_sheet(sheet_url)
+            if worksheet:
+                 try:
+                     existing_ids = load_existing_lead_ids(worksheet, sheet_url)
+                     logger.info("Loaded %s existing leads from Sheet for deduplication.", len(existing_ids))
+                 except Exception as e:
+                     logger.warning("Could not load existing records: %s", e)
+            else:
+                use_sheet = False
+
+        # Dedupe raw leads against existing Sheet IDs *before* processing
+        # AND Filter by State/Location if possible
+        unique_raw_leads = []
     
-    # Simple state matching from location string
-    target_state = None
-    if "," in location:
-        # e.g. "New York, NY" -> "NY"
-        parts = location.split(",")
-        potential_state = parts[-1].strip().upper()
-        if len(potential_state) == 2:
-            target_state = potential_state
-            print(f"Filtering results for state: {target_state}")
+        # Simple state matching from location string
+        target_state = None
+        if "," in location:
+            # e.g. "New York, NY" -> "NY"
+            parts = location.split(",")
+            potential_state = parts[-1].strip().upper()
+            if len(potential_state) == 2:
+                target_state = potential_state
+                accepted_states = STATE_ALIASES.get(target_state, {target_state})
+                logger.info("Filtering results for state: %s", target_state)
     
-    skipped_location = 0
-    for lead in raw_leads:
-        # Location Check
-        if target_state:
-            lead_state = lead.get('state', '')
-            # Handle empty state or mismatch
-            if lead_state and lead_state != target_state and lead_state != "New York": # Allow full name too logic
-                address_str = str(lead.get('address', '')).upper()
-                state_str = str(lead.get('state', '')).upper()
-                
-                if target_state not in state_str and target_state not in address_str:
-                     skipped_location += 1
-                     continue
-
-        lid = get_lead_id(lead['name'], lead['address'])
-        if lid not in existing_ids:
-            unique_raw_leads.append(lead)
+        skipped_location = 0
+        for lead in raw_leads:
+            # Location Check
+            if target_state:
+                lead_state = str(lead.get('state') or '').strip().upper()
+                # Empty state is allowed; otherwise accept the abbreviation or full name,
+                # or an address that mentions the target state
+                if lead_state and lead_state not in accepted_states and target_state not in str(lead.get('address') or '').upper():
+                    skipped_location += 1
+                    continue
+
+            lid = get_lead_id(lead['name'], lead['address'])
+            lead['lead_id'] = lid
+            if lid not in existing_ids:
+                unique_raw_leads.append(lead)
+
+        # Skip businesses already in the user's Outreach leads (the callback would drop them anyway)
+        if supabase_url and supabase_key and user_id and unique_raw_leads:
+            try:
+                existing_names = fetch_existing_company_names(
+                    supabase_url, supabase_key, user_id,
+                    [(lead.get('name') or '').strip() for lead in unique_raw_leads],
+                )
+                if existing_names:
+                    before = len(unique_raw_leads)
+                    unique_raw_leads = [lead for lead in unique_raw_leads if (lead.get('name') or '').strip() not in existing_names]
+                    stats["leads_skipped_existing"] = before - len(unique_raw_leads)
+                    logger.info("Skipping %s businesses already in Outreach.", stats["leads_skipped_existing"])
+            except Exception as e:
+                logger.warning("Could not check existing leads in Supabase: %s", e)
     
-    print(f"Leads to process: {len(unique_raw_leads)} (Skipped {len(raw_leads) - len(unique_raw_leads) - skipped_location} existing, {skipped_location} wrong location)")
+        logger.info("Leads to process: %s (Skipped %s existing, %s wrong location)", len(unique_raw_leads), len(raw_leads) - len(unique_raw_leads) - skipped_location, skipped_location)
 
-    # 2. Enrich (Parallel with Batch Saving)
-    progress.update("enriching", 0, f"Enriching {len(unique_raw_leads)} leads with contact data...")
-    print("Layer 2: Enriching with website data (Max Workers: 8)...")
-    enriched_leads = []
-    total_to_enrich = len(unique_raw_leads)
+        # 2. Enrich (Parallel with Batch Saving)
+        progress.update("enriching", 0, f"Enriching {len(unique_raw_leads)} leads with contact data...")
+        logger.info("Layer 2: Enriching with website data (Concurrency: %s)...", ENRICH_CONCURRENCY)
+        enriched_leads = []
+        total_to_enrich = len(unique_raw_leads)
     
-    # Prepare saver helper
-    def save_batch(batch_leads):
-        if not batch_leads: return
+        # Prepare saver helper
+        def save_batch(batch_leads):
+            if not batch_leads: return
         
-        if force_json:
-            save_to_json(batch_leads)
-            print(f"  Saved batch of {len(batch_leads)} leads to JSON.")
+            if force_json:
+                save_to_jsonl(batch_leads)
+                logger.info("  Saved batch of %s leads to JSONL.", len(batch_leads))
         
-        elif use_sheet and worksheet:
-            try:
-                new_rows = []
-                # Headers definition - Outreach Focused
-                headers = [
-                    "business_name", "category", "rating", "review_count",
-                    "owner_name", "owner_title", "emails", "phone",
-                    "website", "linkedin", "facebook", "instagram", "facebook_pixel", "google_pixel",
-                    "executive_summary", "city", "state", "lead_id"
-                ]
-                for l in batch_leads:
-                    # Double check ID again just in case (though we checked raw)
-                    if str(l['lead_id']) not in existing_ids:
-                        row = [l.get(h, "") for h in headers]
-                        new_rows.append(row)
-                        existing_ids.add(str(l['lead_id'])) # Add to local set to prevent dups in same run
+            elif use_sheet and worksheet:
+                try:
+                    new_rows = []
+                    for l in batch_leads:
+                        # Double check ID again just in case (though we checked raw)
+                        if str(l['lead_id']) not in existing_ids:
+                            row = [l.get(h, "") for h in OUTREACH_HEADERS]
+                            new_rows.append(row)
+                            existing_ids.add(str(l['lead_id'])) # Add to local set to prevent dups in same run
                 
-                if new_rows:
-                    worksheet.append_rows(new_rows)
-                    print(f"  Saved batch of {len(new_rows)} leads to Sheet.")
-            except Exception as e:
-                print(f"  Error saving batch to sheet: {e}")
-                # Fallbacks
-                if force_json:
-                    save_to_json(batch_leads)
-                else:
-                    save_to_csv(batch_leads)
-        else:
-            save_to_csv(batch_leads)
-            print(f"  Saved batch of {len(batch_leads)} leads to CSV.")
-
-    batch_buffer = []
-    BATCH_SIZE = 10
-    
-    with ThreadPoolExecutor(max_workers=8) as executor:
-        # Submit all tasks
-        futures = {executor.submit(process_lead, lead, query_1, anthropic_key): lead for lead in unique_raw_leads}
-
-        for i, future in enumerate(as_completed(futures)):
-            try:
-                result = future.result()
-                enriched_leads.append(result)
-                batch_buffer.append(result)
-
-                # Update progress
-                enriched_count = len(enriched_leads)
-                pct = int((enriched_count / total_to_enrich) * 100) if total_to_enrich > 0 else 100
-                if enriched_count % 5 == 0 or enriched_count == total_to_enrich:
-                    progress.update("enriching", pct, f"Enriched {enriched_count}/{total_to_enrich} leads...")
-
-                # Batch Save
-                if len(batch_buffer) >= BATCH_SIZE:
-                    save_batch(batch_buffer)
-                    batch_buffer = []
-
-            except Exception as e:
-                print(f"Worker exception: {e}")
-                
-    # Save remaining
-    if batch_buffer:
-        save_batch(batch_buffer)
-
-    # Final progress update
-    progress.update("finalizing", 100, f"Enrichment complete! {len(enriched_leads)} leads ready.")
-    print("Pipeline Complete.")
-
-    return enriched_leads
+                    if new_rows:
+                        worksheet.append_rows(new_rows)
+                        logger.info("  Saved batch of %s leads to Sheet.", len(new_rows))
+                except Exception as e:
+                    logger.error("  Error saving batch to sheet: %s", e)
+                    # Fallbacks
+                    if force_json:
+                        save_to_jsonl(batch_leads)
+                    else:
+                        save_to_csv(batch_leads)
+            else:
+                save_to_csv(batch_leads)
+                logger.info("  Saved batch of %s leads to CSV.", len(batch_leads))
+
+        BATCH_SIZE = 10
+
+        async def enrich_all():
+            batch_buffer = []
+            semaphore = asyncio.Semaphore(ENRICH_CONCURRENCY)
+
+            # One pooled HTTP client and one Claude client per run, reused across leads
+            async with contextlib.AsyncExitStack() as stack:
+                client = await stack.enter_async_context(make_http_client())
+                # Without a key, each lead's extract_contacts raises and the lead is kept unenriched
+                api_key = anthropic_key or ANTHROPIC_API_KEY
+                anthropic = await stack.enter_async_context(make_anthropic_client(api_key)) if api_key else None
+
+                async def bounded(lead):
+                    async with semaphore:
+                        return await process_lead(lead, query_1, anthropic_key, client, anthropic)
+
+                for next_done in asyncio.as_completed([bounded(lead) for lead in unique_raw_leads]):
+                    try:
+                        result = await next_done
+                        enriched_leads.append(result)
+                        batch_buffer.append(result)
+
+                        # Update progress
+                        enriched_count = len(enriched_leads)
+                        pct = int((enriched_count / total_to_enrich) * 100) if total_to_enrich > 0 else 100
+                        if enriched_count % 5 == 0 or enriched_count == total_to_enrich:
+                            progress.update("enriching", pct, f"Enriched {enriched_count}/{total_to_enrich} leads...")
+
+                        # Batch Save
+                        if len(batch_buffer) >= BATCH_SIZE:
+                            save_batch(batch_buffer)
+                            batch_buffer = []
+
+                    except Exception as e:
+                        logger.error("Worker exception: %s", e)
+
+            # Save remaining
+            if batch_buffer:
+                save_batch(batch_buffer)
+
+        asyncio.run(enrich_all())
+
+        # Final progress update
+        progress.update("finalizing", 100, f"Enrichment complete! {len(enriched_leads)} leads ready.")
+        logger.info("Pipeline Complete.")
+
+        return enriched_leads
+    finally:
+        # Flush the last coalesced progress update and stop the sender thread
+        progress.close()
 
 def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     parser = argparse.ArgumentParser(description="Google Maps Lead Gen Pipeline")
     parser.add_argument("--niche", help="Target niche (e.g. plumbers)")
     parser.add_argument("--location", help="Target location (e.g. Austin TX)")
@@ -466,7 +615,7 @@ def main():
     parser.add_argument("--limit", type=int, default=10, help="Max results")
     parser.add_argument("--sheet-url", help="Google Sheet URL to append to")
     parser.add_argument("--csv", action="store_true", help="Force save to CSV")
-    parser.add_argument("--json", action="store_true", help="Force save to JSON")
+    parser.add_argument("--json", action="store_true", help="Force save to JSON Lines (.jsonl)")
     
     args = parser.parse_args()
     
@@ -476,7 +625,7 @@ def main():
     elif args.niche and args.location:
         run_gmaps_pipeline(args.niche, args.location, args.limit, args.increase_radius, args.sheet_url, args.csv, args.json)
     else:
-        print("Error: Must provide --search OR (--niche and --location)")
+        logger.error("Error: Must provide --search OR (--niche and --location)")
 
 if __name__ == "__main__":
     main()
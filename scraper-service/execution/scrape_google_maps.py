@@ -1,17 +1,49 @@
 import os
 import argparse
-import json
+import logging
+import orjson
+import sys
+import time
 from apify_client import ApifyClient
 from dotenv import load_dotenv
 
-# Load environment variables (used for CLI mode only)
-dotenv_path = os.path.join(os.getcwd(), '.env')
-if os.path.exists(dotenv_path):
-    load_dotenv(dotenv_path)
-else:
-    # Try loading from the directory of the script's parent (project root)
-    load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
+logger = logging.getLogger(__name__)
 
+# Load environment variables (used for CLI mode only). Modal injects the
+# environment directly, so containers skip the .env lookup.
+if not os.getenv("MODAL_TASK_ID"):
+    dotenv_path = os.path.join(os.getcwd(), '.env')
+    if os.path.exists(dotenv_path):
+        load_dotenv(dotenv_path)
+    else:
+        load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
+
+# Fallback when no per-user key is passed in; resolved once at import
+APIFY_API_TOKEN = os.getenv("APIFY_API_TOKEN")
+
+# Output field -> Apify dataset field, projected onto every scraped item
+FIELD_MAP = (
+    ("name", "title"),
+    ("address", "address"),
+    ("phone", "phoneUnformatted"),
+    ("website", "website"),
+    ("rating", "totalScore"),
+    ("reviews", "reviewsCount"),
+    ("place_id", "placeId"),
+    ("google_maps_url", "url"),
+    ("category", "categoryName"),
+    ("city", "city"),
+    ("state", "state"),
+    ("zip_code", "postalCode"),
+    ("country", "countryCode"),
+    ("location", "location"),  # lat/lng
+)
+OUT_KEYS = tuple(out for out, _ in FIELD_MAP)
+SRC_KEYS = tuple(src for _, src in FIELD_MAP)
+
+# Seconds between run status polls; the last delay repeats until the run ends
+POLL_DELAYS = (0.2, 0.5, 1.0, 2.0, 5.0)
+TERMINAL_STATUSES = {"SUCCEEDED", "FAILED", "ABORTED", "TIMED-OUT"}
 
 def scrape_google_maps(search_query, limit, apify_token=None, location_bias=None):
     """
@@ -22,9 +54,12 @@ def scrape_google_maps(search_query, limit, apify_token=None, location_bias=None
         limit: Maximum number of results to scrape
         apify_token: Optional Apify API token. If not provided, uses APIFY_API_TOKEN env var.
         location_bias: Optional string to minimize 'too far' warnings (e.g. "Sydney, Australia")
+
+    Yields one business dict per dataset item as it is read, so callers can
+    consume results without holding a second copy of the dataset.
     """
     # Use provided token or fall back to environment variable
-    token = apify_token or os.getenv("APIFY_API_TOKEN")
+    token = apify_token or APIFY_API_TOKEN
 
     if not token:
         raise ValueError("Apify token not provided and APIFY_API_TOKEN not found in environment variables.")
@@ -44,38 +79,50 @@ def scrape_google_maps(search_query, limit, apify_token=None, location_bias=None
     if location_bias:
         run_input["locationQuery"] = location_bias
 
-    print(f"Starting Apify scraper for query: '{search_query}' (Location Bias: {location_bias}) with limit: {limit}...")
+    logger.info("Starting Apify scraper for query: '%s' (Location Bias: %s) with limit: %s...", search_query, location_bias, limit)
     
-    # Run the Actor and wait for it to finish
-    run = client.actor("compass/crawler-google-places").call(run_input=run_input)
-
-    print(f"Apify run finished. Fetching results from dataset...")
-
-    # Fetch results from the Actor's default dataset
-    results = []
-    for item in client.dataset(run["defaultDatasetId"]).iterate_items():
-        # Extract only relevant fields
-        business_data = {
-            "name": item.get("title"),
-            "address": item.get("address"),
-            "phone": item.get("phoneUnformatted"),
-            "website": item.get("website"),
-            "rating": item.get("totalScore"),
-            "reviews": item.get("reviewsCount"),
-            "place_id": item.get("placeId"),
-            "google_maps_url": item.get("url"),
-            "category": item.get("categoryName"),
-            "city": item.get("city"),
-            "state": item.get("state"),
-            "zip_code": item.get("postalCode"),
-            "country": item.get("countryCode"),
-            "location": item.get("location"), # lat/lng
-        }
-        results.append(business_data)
-
-    return results
+    # Start the Actor and read its dataset while it runs, rather than waiting
+    # for the whole scrape before downloading anything
+    run = client.actor("compass/crawler-google-places").start(run_input=run_input)
+    run_client = client.run(run["id"])
+    dataset = client.dataset(run["defaultDatasetId"])
+    status = run["status"]
+    offset = 0
+    polls = 0
+
+    try:
+        while True:
+            # Read a status first: once it is terminal, this pass drains the rest
+            status = run_client.get()["status"]
+
+            # Apify projects the items server-side, so only the mapped fields
+            # are downloaded and parsed
+            for item in dataset.iterate_items(offset=offset, fields=list(SRC_KEYS), skip_hidden=True):
+                offset += 1
+                if item:
+                    yield dict(zip(OUT_KEYS, map(item.get, SRC_KEYS)))
+
+            if status in TERMINAL_STATUSES:
+                break
+            time.sleep(POLL_DELAYS[min(polls, len(POLL_DELAYS) - 1)])
+            polls += 1
+    finally:
+        # The consumer stopped early (limit reached, error): don't leave the run billing
+        if status not in TERMINAL_STATUSES:
+            logger.info("Aborting Apify run %s", run['id'])
+            try:
+                run_client.abort()
+            except Exception as e:
+                logger.warning("Failed to abort Apify run %s: %s", run['id'], e)
+
+    if status != "SUCCEEDED":
+        logger.warning("Apify run ended with status %s after %s results", status, offset)
+    else:
+        logger.info("Apify run finished with %s results", offset)
 
 if __name__ == "__main__":
+    # Logs go to stderr, so stdout carries only the JSON result
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     parser = argparse.ArgumentParser(description="Scrape Google Maps businesses.")
     parser.add_argument("--search", required=True, help="Search query (e.g., 'plumbers in Austin TX')")
     parser.add_argument("--limit", type=int, default=10, help="Max number of results to scrape")
@@ -83,7 +130,7 @@ if __name__ == "__main__":
     args = parser.parse_args()
 
     try:
-        data = scrape_google_maps(args.search, args.limit)
-        print(json.dumps(data, indent=2))
+        data = list(scrape_google_maps(args.search, args.limit))
+        sys.stdout.buffer.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE))
     except Exception as e:
-        print(f"Error: {e}")
+        logger.error("Error: %s", e)
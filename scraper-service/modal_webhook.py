@@ -6,31 +6,222 @@ and executes the lead scraping pipeline in the background on Modal's infrastruct
 """
 
 import modal
+import atexit
+import hmac
 import json
+import logging
 import os
+import random
+import time
+import zlib
+from typing import Annotated
+
+# Module loggers in execution/ propagate here; Modal captures the container's stderr
+logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+# httpx logs every request at INFO, which would bury the pipeline's own lines
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
 
 # Create Modal app
 app = modal.App("gmaps-lead-pipeline")
 
-# Create image with required dependencies and local code
-image = (
+# Pinned dependency layer. Exact minor versions keep the layer's hash stable,
+# so Modal reuses the cached build across deploys instead of reinstalling
+# whenever a package publishes a release. apify-client stays on 2.x, which
+# returns plain dicts (3.x returns models).
+BASE = (
     modal.Image.debian_slim(python_version="3.11")
     .pip_install(
-        "httpx",
-        "anthropic",
-        "apify-client",
-        "html2text",
-        "gspread",
-        "python-dotenv",
-        "fastapi",
+        "httpx[http2]==0.28.*",
+        "anthropic==1.13.*",
+        "apify-client==2.5.*",
+        "selectolax==1.0.*",
+        "gspread==6.2.*",
+        "python-dotenv==1.2.*",
+        "fastapi==0.143.*",
+        "pydantic==2.14.*",
+        "orjson==3.13.*",
+        "diskcache==5.6.*",
     )
-    .add_local_dir("./execution", remote_path="/root/execution")
 )
 
+# Local code goes in its own final layer, so edits to execution/ don't
+# invalidate the dependency layer
+image = BASE.add_local_dir("./execution", remote_path="/root/execution")
+
+# Deployment-wide config, injected as environment variables rather than sent
+# with every request: SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY and
+# SCRAPE_WEBHOOK_SECRET (the same values the edge functions use). Create with
+#   modal secret create gmaps-pipeline-supabase SUPABASE_URL=... SUPABASE_SERVICE_ROLE_KEY=... SCRAPE_WEBHOOK_SECRET=...
+# The Apify and Anthropic keys are per user, so they still arrive with each job.
+SUPABASE_SECRET = modal.Secret.from_name("gmaps-pipeline-supabase")
+
+# job_id -> spawn time for jobs currently running, so a retried webhook for the
+# same job doesn't start a second pipeline. Entries are removed when the run
+# ends; one older than the pipeline timeout belongs to a run that died without
+# cleaning up and is overwritten.
+INFLIGHT_JOBS = modal.Dict.from_name("gmaps-inflight-jobs", create_if_missing=True)
+INFLIGHT_TTL = 960  # pipeline timeout plus a minute
+
+# Third-party packages are installed in the image, not necessarily where
+# `modal deploy` runs. Outside the container the ImportError is deferred and
+# the rest of this block (the request model) is skipped; inside it, a failed
+# import is raised as usual.
+with image.imports():
+    import httpx
+    import orjson
+    from fastapi import HTTPException, Request
+    from pydantic import BaseModel, Field, SecretStr, ValidationError
+
+    NonEmptyStr = Annotated[str, Field(min_length=1)]
+    NonEmptySecret = Annotated[SecretStr, Field(min_length=1)]
+
+    class ScrapeRequest(BaseModel):
+        """
+        Payload sent by the start-scrape edge function. The webhook validates
+        the raw body against it in one pass and answers 422 on missing or
+        malformed fields; SecretStr keeps the keys out of logs and reprs.
+        Unknown fields (such as the Supabase credentials older edge function
+        deployments still send) are ignored.
+        """
+        job_id: NonEmptyStr
+        user_id: NonEmptyStr
+        niche: NonEmptyStr
+        location: NonEmptyStr
+        limit: int = 50
+        increase_radius: bool = True
+        apify_token: NonEmptySecret
+        anthropic_key: NonEmptySecret
+
+
+# A scrape request is a handful of short fields; anything much larger is
+# rejected before it is read into memory or parsed
+MAX_BODY_BYTES = 16384
+
+
+async def read_capped_body(request):
+    """
+    Reads the request body, answering 413 as soon as it is known to exceed
+    MAX_BODY_BYTES: from Content-Length when sent, else while streaming.
+    """
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > MAX_BODY_BYTES:
+        raise HTTPException(status_code=413, detail="Request body too large")
+
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > MAX_BODY_BYTES:
+            raise HTTPException(status_code=413, detail="Request body too large")
+    return bytes(body)
+
+
+# One pooled client per container, so callbacks from consecutive jobs reuse
+# the connection to Supabase instead of paying a new TLS handshake each time
+_CALLBACK_CLIENT = None
+
+
+def get_callback_client():
+    """Returns the container's shared callback client, created on first use."""
+    global _CALLBACK_CLIENT
+    if _CALLBACK_CLIENT is None:
+        _CALLBACK_CLIENT = httpx.Client(
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+            http2=True,
+        )
+        atexit.register(_CALLBACK_CLIENT.close)
+    return _CALLBACK_CLIENT
+
+
+def release_job(job_id):
+    """Drops the job's in-flight claim so the same job_id can be started again."""
+    try:
+        INFLIGHT_JOBS.pop(job_id)
+    except KeyError:
+        pass
+    except Exception as e:
+        logger.error("Failed to release in-flight claim for job %s: %s", job_id, e)
+
+
+# Statuses worth retrying; anything else (bad secret, malformed body) won't
+# succeed on a second attempt
+CALLBACK_RETRY_STATUSES = {429, 500, 502, 503, 504}
+CALLBACK_MAX_ATTEMPTS = 5
+CALLBACK_MAX_DELAY = 30
+
+
+def ndjson_body(result):
+    """
+    Yields the callback body as NDJSON: a header line with everything but the
+    leads (plus leads_count), then one line per lead. Encoding lead by lead
+    avoids holding the whole payload as one JSON document in memory.
+    """
+    header = {k: v for k, v in result.items() if k != "leads"}
+    header["leads_count"] = len(result["leads"])
+    yield orjson.dumps(header) + b"\n"
+    for lead in result["leads"]:
+        yield orjson.dumps(lead) + b"\n"
+
+
+def gzip_stream(chunks):
+    """
+    Gzips a stream of byte chunks on the fly. Level 1 costs little CPU and
+    still shrinks the lead JSON several times over.
+    """
+    compressor = zlib.compressobj(1, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def post_callback(callback_url, result, callback_secret, job_id):
+    """
+    POSTs the pipeline result to the Supabase callback as streamed, gzipped NDJSON,
+    retrying transient failures with exponential backoff and jitter (or the
+    server's Retry-After). The job_id is sent as the Idempotency-Key;
+    scrape-callback acknowledges a retry for a job it has already finalized
+    without importing the leads again.
+
+    Returns the final response, or None if every attempt failed to connect.
+    """
+    headers = {
+        "Content-Type": "application/x-ndjson",
+        "Content-Encoding": "gzip",
+        "Authorization": f"Bearer {callback_secret}",
+        "Idempotency-Key": job_id,
+    }
+
+    for attempt in range(CALLBACK_MAX_ATTEMPTS):
+        response = None
+        try:
+            # A fresh generator per attempt, since a failed attempt may have consumed part of one
+            response = get_callback_client().post(callback_url, content=gzip_stream(ndjson_body(result)), headers=headers)
+            if response.status_code not in CALLBACK_RETRY_STATUSES:
+                return response
+            logger.warning("Callback attempt %s got %s", attempt + 1, response.status_code)
+        except httpx.TransportError as e:
+            logger.warning("Callback attempt %s failed: %s", attempt + 1, e)
+
+        if attempt == CALLBACK_MAX_ATTEMPTS - 1:
+            break
+
+        delay = min(CALLBACK_MAX_DELAY, 0.5 * 2 ** attempt) + random.random() * 0.2
+        retry_after = response.headers.get("Retry-After", "") if response is not None else ""
+        if retry_after.isdigit():
+            delay = min(CALLBACK_MAX_DELAY, int(retry_after))
+        time.sleep(delay)
+
+    logger.error("Callback for job %s gave up after %s attempts", job_id, CALLBACK_MAX_ATTEMPTS)
+    return response
+
 
 @app.function(
     image=image,
-    timeout=900,  # 15 minute timeout for long scrapes
+    timeout=900,  # 15 minute timeout for long scrapes (see INFLIGHT_TTL)
+    secrets=[SUPABASE_SECRET],
 )
 def run_pipeline(
     job_id: str,
@@ -41,18 +232,18 @@ def run_pipeline(
     increase_radius: bool,
     apify_token: str,
     anthropic_key: str,
-    callback_url: str,
-    callback_secret: str,
-    supabase_url: str,
-    supabase_key: str,
 ):
     """
     Executes the GMaps lead pipeline and sends results to callback.
     """
     import sys
-    import httpx
     sys.path.insert(0, "/root")
 
+    supabase_url = os.environ["SUPABASE_URL"].rstrip("/")
+    supabase_key = os.environ["SUPABASE_SERVICE_ROLE_KEY"]
+    callback_secret = os.environ["SCRAPE_WEBHOOK_SECRET"]
+    callback_url = f"{supabase_url}/functions/v1/scrape-callback"
+
     # Import the pipeline runner
     from execution.gmaps_lead_pipeline import run_gmaps_pipeline
 
@@ -64,10 +255,11 @@ def run_pipeline(
         "leads": [],
         "error": None,
     }
+    stats = {}
 
     try:
-        print(f"Starting pipeline for job {job_id}")
-        print(f"Niche: {niche}, Location: {location}, Limit: {limit}")
+        logger.info("Starting pipeline for job %s", job_id)
+        logger.info("Niche: %s, Location: %s, Limit: %s", niche, location, limit)
 
         # Run the pipeline
         enriched_leads = run_gmaps_pipeline(
@@ -78,84 +270,121 @@ def run_pipeline(
             apify_token=apify_token,
             anthropic_key=anthropic_key,
             job_id=job_id,
+            user_id=user_id,
             supabase_url=supabase_url,
             supabase_key=supabase_key,
             force_json=True,  # Always use JSON format for callback
+            stats=stats,
         )
 
         result["leads"] = enriched_leads
         result["leads_count"] = len(enriched_leads)
-        print(f"Pipeline complete. Found {len(enriched_leads)} leads.")
+        # Leads the user already had never reach the callback; send their count
+        # so the job's found/skipped stats still include them
+        result["leads_skipped_existing"] = stats.get("leads_skipped_existing", 0)
+        logger.info("Pipeline complete. Found %s leads.", len(enriched_leads))
 
     except Exception as e:
-        print(f"Pipeline error: {e}")
+        logger.error("Pipeline error: %s", e)
         result["status"] = "error"
         result["error"] = str(e)
 
     # Send callback to Supabase
     try:
-        print(f"Sending callback to {callback_url}")
-        with httpx.Client(timeout=30) as client:
-            response = client.post(
-                callback_url,
-                json=result,
-                headers={
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {callback_secret}",
-                },
-            )
-            print(f"Callback response: {response.status_code}")
+        logger.info("Sending callback to %s", callback_url)
+        response = post_callback(callback_url, result, callback_secret, job_id)
+        if response is not None:
+            logger.info("Callback response: %s", response.status_code)
             if response.status_code != 200:
-                print(f"Callback error: {response.text}")
+                logger.error("Callback error: %s", response.text)
     except Exception as e:
-        print(f"Callback failed: {e}")
+        logger.error("Callback failed: %s", e)
+    finally:
+        release_job(job_id)
 
     return result
 
 
-@app.function(image=image)
+def is_authorized(request):
+    """
+    Checks the caller's bearer token against SCRAPE_WEBHOOK_SECRET in constant
+    time. The pipeline acts with the service role key, so only start-scrape,
+    which holds the same secret, may start it.
+    """
+    expected = os.environ.get("SCRAPE_WEBHOOK_SECRET", "")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if not expected or scheme.lower() != "bearer":
+        return False
+    return hmac.compare_digest(token.encode(), expected.encode())
+
+
+# Keep the webhook warm so starting a scrape doesn't wait on a cold container
+# booting and importing its dependencies; run_pipeline still scales to zero
+@app.function(image=image, min_containers=1, buffer_containers=1, secrets=[SUPABASE_SECRET])
 @modal.fastapi_endpoint(method="POST")
-def webhook(data: dict):
+async def webhook(request: "Request"):
     """
     HTTP webhook endpoint that receives scrape requests from Supabase.
     Spawns the pipeline as a background task and returns immediately.
+
+    The body is read and size-checked by hand rather than declared as a
+    ScrapeRequest parameter, since FastAPI would parse an arbitrarily large
+    body before any check could run. The annotation is quoted because Request
+    is only imported inside the container.
+
+    Callers must send SCRAPE_WEBHOOK_SECRET as a bearer token; anything else
+    gets a 401 before the body is read or the job is claimed.
     """
-    print(f"Webhook received: job_id={data.get('job_id')}")
+    if not is_authorized(request):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    body = await read_capped_body(request)
+    try:
+        req = ScrapeRequest.model_validate_json(body)
+    except ValidationError as e:
+        # Leave out the offending input, which may be one of the keys
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False, include_input=False))
 
-    # Validate required fields
-    required_fields = [
-        "job_id", "user_id", "niche", "location",
-        "apify_token", "anthropic_key", "callback_url", "callback_secret",
-        "supabase_url", "supabase_key"
-    ]
+    logger.info("Webhook received: job_id=%s", req.job_id)
 
-    missing = [f for f in required_fields if not data.get(f)]
-    if missing:
-        return {"status": "error", "message": f"Missing required fields: {missing}"}
+    # Claim the job atomically; a duplicate delivery is acknowledged without
+    # spawning so the sender stops retrying
+    now = time.time()
+    if not await INFLIGHT_JOBS.put.aio(req.job_id, now, skip_if_exists=True):
+        started = await INFLIGHT_JOBS.get.aio(req.job_id, now)
+        if now - started < INFLIGHT_TTL:
+            logger.info("Job %s already running, ignoring duplicate webhook", req.job_id)
+            return {
+                "status": "accepted",
+                "job_id": req.job_id,
+                "message": "Pipeline already running",
+                "dedup": True,
+            }
+        await INFLIGHT_JOBS.put.aio(req.job_id, now)
 
     try:
         # Spawn the pipeline as a background task
-        run_pipeline.spawn(
-            job_id=data["job_id"],
-            user_id=data["user_id"],
-            niche=data["niche"],
-            location=data["location"],
-            limit=data.get("limit", 50),
-            increase_radius=data.get("increase_radius", True),
-            apify_token=data["apify_token"],
-            anthropic_key=data["anthropic_key"],
-            callback_url=data["callback_url"],
-            callback_secret=data["callback_secret"],
-            supabase_url=data["supabase_url"],
-            supabase_key=data["supabase_key"],
+        await run_pipeline.spawn.aio(
+            job_id=req.job_id,
+            user_id=req.user_id,
+            niche=req.niche,
+            location=req.location,
+            limit=req.limit,
+            increase_radius=req.increase_radius,
+            apify_token=req.apify_token.get_secret_value(),
+            anthropic_key=req.anthropic_key.get_secret_value(),
         )
 
         return {
             "status": "accepted",
-            "job_id": data["job_id"],
+            "job_id": req.job_id,
             "message": "Pipeline started in background",
         }
 
     except Exception as e:
-        print(f"Webhook error: {e}")
+        logger.error("Webhook error: %s", e)
+        try:
+            await INFLIGHT_JOBS.pop.aio(req.job_id)
+        except Exception:
+            pass
         return {"status": "error", "message": str(e)}
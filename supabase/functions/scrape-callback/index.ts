@@ -27,6 +27,9 @@ interface WebhookPayload {
   secret: string;
   status: 'success' | 'error';
   error_message?: string;
+  leads_count?: number;
+  // Leads the scraper dropped before enrichment because the user already has them
+  leads_skipped_existing?: number;
   leads: ScrapedLead[];
 }
 
@@ -229,6 +232,35 @@ function normalizeLead(l: ScrapedLead): ScrapedLead {
   };
 }
 
+// Read the request body as text, decompressing it when the scraper sent it
+// gzipped (Content-Encoding: gzip)
+async function readBody(req: Request): Promise<string> {
+  const encoding = (req.headers.get('Content-Encoding') || '').toLowerCase();
+  if (encoding === 'gzip' && req.body) {
+    return await new Response(req.body.pipeThrough(new DecompressionStream('gzip'))).text();
+  }
+  return await req.text();
+}
+
+// Parse the callback body. The scraper streams NDJSON (a header line with the
+// job fields and leads_count, then one lead per line); a single JSON document
+// is still accepted for older scraper deployments.
+async function parsePayload(req: Request): Promise<WebhookPayload> {
+  const text = await readBody(req);
+  const contentType = req.headers.get('Content-Type') || '';
+  if (!contentType.includes('application/x-ndjson')) {
+    return JSON.parse(text);
+  }
+
+  const lines = text.split('\n').filter(line => line.trim().length > 0);
+  if (lines.length === 0) {
+    throw new Error('Empty NDJSON callback body');
+  }
+  const header = JSON.parse(lines[0]);
+  const leads: ScrapedLead[] = lines.slice(1).map(line => JSON.parse(line));
+  return { ...header, leads };
+}
+
 serve(async (req) => {
   const corsHeaders = getCorsHeaders(req);
 
@@ -240,7 +272,7 @@ serve(async (req) => {
   try {
     // 1. Validate webhook secret (accept from Authorization header OR body)
     const webhookSecret = Deno.env.get('SCRAPE_WEBHOOK_SECRET');
-    const payload: WebhookPayload = await req.json();
+    const payload = await parsePayload(req);
 
     // Check Authorization header first, then fall back to body
     const authHeader = req.headers.get('Authorization');
@@ -265,6 +297,7 @@ serve(async (req) => {
     );
 
     const { job_id, user_id, status, error_message, leads } = payload;
+    const skippedExisting = Math.max(0, Math.floor(Number(payload.leads_skipped_existing) || 0));
 
     // 3. Verify job exists and belongs to user
     const { data: existingJob, error: jobError } = await supabaseAdmin
@@ -284,7 +317,47 @@ serve(async (req) => {
 
     // Note: Job is already set to 'processing' by start-scrape, no need to update again
 
-    // 4. Handle error case from scraper
+    // The scraper retries callbacks with the job_id as Idempotency-Key. If the
+    // job is already finalized, this is a replay of a delivery we processed
+    // (e.g. the sender timed out waiting for our response): acknowledge it
+    // without importing the leads or rewriting the job stats a second time.
+    const idempotencyKey = req.headers.get('Idempotency-Key');
+    if (idempotencyKey === job_id && (existingJob.status === 'completed' || existingJob.status === 'failed')) {
+      console.log(`Ignoring replayed callback for job ${job_id} (already ${existingJob.status})`);
+      return new Response(JSON.stringify({ success: true, duplicate: true }), {
+        headers: { ...corsHeaders, 'Content-Type': 'application/json' },
+        status: 200,
+      });
+    }
+
+    // 4a. Every business found is one the user already has: nothing to import,
+    // but the scrape itself succeeded
+    if (status !== 'error' && (!leads || leads.length === 0) && skippedExisting > 0) {
+      await supabaseAdmin
+        .from('scrape_jobs')
+        .update({
+          status: 'completed',
+          completed_at: new Date().toISOString(),
+          leads_found: skippedExisting,
+          leads_imported: 0,
+          leads_skipped: skippedExisting,
+        })
+        .eq('id', job_id);
+
+      console.log(`Job ${job_id} completed: all ${skippedExisting} leads already existed`);
+
+      return new Response(JSON.stringify({
+        success: true,
+        leads_found: skippedExisting,
+        leads_imported: 0,
+        leads_skipped: skippedExisting,
+      }), {
+        headers: { ...corsHeaders, 'Content-Type': 'application/json' },
+        status: 200,
+      });
+    }
+
+    // 4b. Handle error case from scraper
     if (status === 'error' || !leads || leads.length === 0) {
       await supabaseAdmin
         .from('scrape_jobs')
@@ -395,16 +468,16 @@ serve(async (req) => {
           status: 'failed',
           error_message: `Failed to import leads: ${insertError.message || 'Unknown error'}`,
           completed_at: new Date().toISOString(),
-          leads_found: leads.length,
+          leads_found: leads.length + skippedExisting,
           leads_imported: insertedCount,
-          leads_skipped: leads.length - insertedCount,
+          leads_skipped: leads.length - insertedCount + skippedExisting,
         })
         .eq('id', job_id);
 
       return new Response(JSON.stringify({
         success: false,
         error: 'Failed to import leads',
-        leads_found: leads.length,
+        leads_found: leads.length + skippedExisting,
         leads_imported: insertedCount,
       }), {
         headers: { ...corsHeaders, 'Content-Type': 'application/json' },
@@ -418,9 +491,9 @@ serve(async (req) => {
       .update({
         status: 'completed',
         completed_at: new Date().toISOString(),
-        leads_found: leads.length,
+        leads_found: leads.length + skippedExisting,
         leads_imported: insertedCount,
-        leads_skipped: leads.length - insertedCount,
+        leads_skipped: leads.length - insertedCount + skippedExisting,
       })
       .eq('id', job_id);
 
@@ -430,13 +503,13 @@ serve(async (req) => {
       console.log(`Job ${job_id} status updated to COMPLETED`);
     }
 
-    console.log(`Job ${job_id} completed: ${insertedCount}/${leads.length} leads imported`);
+    console.log(`Job ${job_id} completed: ${insertedCount}/${leads.length} leads imported, ${skippedExisting} already existed`);
 
     return new Response(JSON.stringify({
       success: true,
-      leads_found: leads.length,
+      leads_found: leads.length + skippedExisting,
       leads_imported: insertedCount,
-      leads_skipped: leads.length - insertedCount,
+      leads_skipped: leads.length - insertedCount + skippedExisting,
     }), {
       headers: { ...corsHeaders, 'Content-Type': 'application/json' },
       status: 200,
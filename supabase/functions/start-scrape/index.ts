@@ -147,7 +147,7 @@ serve(async (req) => {
       });
     }
 
-    // 8. Get Modal webhook URL and callback secret
+    // 8. Get Modal webhook URL
     const modalWebhookUrl = Deno.env.get('MODAL_WEBHOOK_URL');
     const webhookSecret = Deno.env.get('SCRAPE_WEBHOOK_SECRET');
 
@@ -166,9 +166,10 @@ serve(async (req) => {
     }
 
     // 9. Call Modal webhook with user's API keys
-    // Use environment variable for Supabase URL (must be the public URL for external callback)
-    const callbackUrl = `${supabaseUrl}/functions/v1/scrape-callback`;
-
+    // The callback URL, callback secret and service role key come from the
+    // Modal secret `gmaps-pipeline-supabase`, so only per-job data is sent here.
+    // The webhook runs with the service role key, so it only accepts callers
+    // presenting the shared webhook secret
     const modalPayload = {
       job_id,
       user_id: user.id,
@@ -178,20 +179,17 @@ serve(async (req) => {
       increase_radius: increase_radius ?? true,
       apify_token: profile.apify_api_token,
       anthropic_key: profile.anthropic_api_key,
-      callback_url: callbackUrl,
-      callback_secret: webhookSecret,
-      // Progress reporting: pass Supabase credentials so Modal can update job status
-      supabase_url: supabaseUrl,
-      supabase_key: supabaseServiceKey,
     };
 
     console.log(`Starting scrape job ${job_id} for user ${user.id}`);
-    console.log(`Callback URL: ${callbackUrl}`);
-    console.log(`Modal Payload (redacted secret):`, { ...modalPayload, callback_secret: '***' });
+    console.log(`Modal Payload (redacted keys):`, { ...modalPayload, apify_token: '***', anthropic_key: '***' });
 
     const modalResponse = await fetch(modalWebhookUrl, {
       method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
+      headers: {
+        'Content-Type': 'application/json',
+        'Authorization': `Bearer ${webhookSecret}`,
+      },
       body: JSON.stringify(modalPayload),
     });
 